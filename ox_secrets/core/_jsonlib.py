@@ -0,0 +1,28 @@
+"""Shared JSON helpers picking the fastest available implementation.
+
+Prefers orjson (C parser, several times faster than stdlib), then
+ujson, then stdlib json, so pure Python deployments keep working with
+no extra dependencies. Exposes `loads` and `dumps` with stdlib-style
+signatures (dumps returns str).
+"""
+
+
+try:
+    import orjson as _impl
+
+    loads = _impl.loads
+
+    def dumps(data) -> str:
+        "Serialize data to a JSON string."
+        return _impl.dumps(data).decode()  # orjson returns bytes
+except ImportError:
+    try:
+        import ujson as _impl
+    except ImportError:
+        import json as _impl
+
+    loads = _impl.loads
+
+    def dumps(data) -> str:
+        "Serialize data to a JSON string."
+        return _impl.dumps(data)
@@ -0,0 +1,30 @@
+"""Inner-loop helper to populate a secrets cache dict.
+
+This lives in its own tiny module so deployments that want to can
+compile it to a C extension with mypyc (producing a module named
+_loader_c); callers import the compiled version when present and fall
+back to this pure Python implementation otherwise.
+"""
+
+import typing
+
+
+def populate_cache(cache: typing.Dict[str, typing.Dict[str, str]],
+                   rows: typing.Iterable[typing.Tuple[str, str, str]],
+                   default_category: str) -> None:
+    """Insert (category, name, value) rows into the cache dict.
+
+    :param cache:  Dict mapping category to {name: value} to fill.
+
+    :param rows:   Iterable of (category, name, value) tuples; a falsy
+                   category falls back to default_category.
+
+    :param default_category:  Category used when a row has none.
+
+    ~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-
+
+    PURPOSE:  The cache-fill loop run for every parsed row on load.
+
+    """
+    for category, name, value in rows:
+        cache.setdefault(category or default_category, {})[name] = value
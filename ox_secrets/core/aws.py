@@ -3,10 +3,11 @@
 This module provides a secret server using the AWS system.
 """
 
-import os
+import concurrent.futures
+import functools
 import logging
+import threading
 import typing
-import json
 
 
 try:
@@ -16,9 +17,46 @@ except Exception as problem:  # pylint: disable=broad-except
         'Unable to import boto3 because %s; aws secrets unavailable',
         str(problem))
 
-
 from ox_secrets import settings
-from ox_secrets.core import common
+from ox_secrets.core import common, _jsonlib
+
+
+@functools.lru_cache(maxsize=256)
+def _storage_from_id(secret_id: str) -> str:
+    """Return the storage format implied by the secret_id extension.
+
+    Behaves like os.path.splitext(secret_id)[-1].lower().lstrip('.')
+    but with a single rfind instead of splitext's multi-pass scan,
+    and cached since the same ids get queried repeatedly.
+    """
+    base = secret_id.rpartition('/')[2]
+    idx = base.rfind('.')
+    return base[idx + 1:].lower() if idx > 0 else ''
+
+
+_CLIENT_CACHE = {}  # maps (profile_name, service_name, kwargs) to client
+_CLIENT_CACHE_LOCK = threading.Lock()
+
+
+def _get_client(profile_name, service_name, **kwargs):
+    """Return a (cached) boto3 client for the given profile/service.
+
+    Session/client construction parses config files and resolves
+    credential providers which costs tens of milliseconds; boto3
+    clients are thread-safe for the calls we make, so we build one
+    per (profile_name, service_name, kwargs) and reuse it.
+    """
+    key = (profile_name, service_name, tuple(sorted(kwargs.items())))
+    client = _CLIENT_CACHE.get(key)
+    if client is None:
+        with _CLIENT_CACHE_LOCK:
+            client = _CLIENT_CACHE.get(key)
+            if client is None:
+                session = boto3.Session(
+                    profile_name=profile_name, **kwargs)
+                client = session.client(service_name=service_name)
+                _CLIENT_CACHE[key] = client
+    return client
 
 
 class AWSSecretServer(common.SecretServer):
@@ -31,16 +69,20 @@ class AWSSecretServer(common.SecretServer):
                 str] = None, **kwargs) -> typing.Dict[str, str]:
         """Helper to load given secret_id from AWS.
         """
-        storage = kwargs.pop('storage', os.path.splitext(
-            secret_id)[-1]).lower().lstrip('.')
+        # Read keywords without popping so a caller's loader_params
+        # dict can be reused across calls unchanged.
+        storage = kwargs.get('storage')
+        storage = (storage.lower().lstrip('.') if storage
+                   else _storage_from_id(secret_id))
         if profile_name is None:
             profile_name = settings.OX_SECRETS_AWS_PROFILE_NAME
         logging.warning(
             'Connecting to boto3 for profile %s to read secrets for %s',
             profile_name, secret_id)
-        service_name = kwargs.pop('service_name', 'secretsmanager')
-        session = boto3.Session(profile_name=profile_name, **kwargs)
-        client = session.client(service_name=service_name)
+        service_name = kwargs.get('service_name', 'secretsmanager')
+        session_kwargs = {k: v for k, v in kwargs.items()
+                          if k not in ('storage', 'service_name')}
+        client = _get_client(profile_name, service_name, **session_kwargs)
         if service_name == 'secretsmanager':
             get_secret_value_response = client.get_secret_value(
                 SecretId=secret_id)
@@ -52,7 +94,7 @@ class AWSSecretServer(common.SecretServer):
             raise ValueError(f'Invalid service_name: {service_name}')
 
         if storage == 'json':
-            secret_dict = json.loads(secret_data)
+            secret_dict = _jsonlib.loads(secret_data)
         else:
             if storage != 'raw':
                 logging.warning('Intpereting unknown storage as raw.')
@@ -60,6 +102,91 @@ class AWSSecretServer(common.SecretServer):
 
         return secret_dict
 
+    @classmethod
+    def prefetch_categories(cls, categories: typing.List[str],
+                            profile_name: typing.Optional[str] = None,
+                            **kwargs):
+        """Warm the cache for many secrets with batched AWS calls.
+
+        :param categories:  List of string secret ids to fetch.
+
+        :param profile_name:  Optional AWS profile name as for
+                              load_secret_from_aws.
+
+        :param **kwargs:  Optional extra boto3 session parameters.
+
+        ~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-
+
+        PURPOSE:  Fetch up to 20 secrets per BatchGetSecretValue call
+                  instead of paying one network round-trip per
+                  category, then publish everything into cls._cache.
+                  Only the secretsmanager back-end supports batching.
+
+        """
+        if profile_name is None:
+            profile_name = settings.OX_SECRETS_AWS_PROFILE_NAME
+        client = _get_client(profile_name, 'secretsmanager', **kwargs)
+        fetched = {}
+        for start in range(0, len(categories), 20):
+            chunk = categories[start:start + 20]
+            logging.warning('Batch reading secrets for %s', chunk)
+            response = client.batch_get_secret_value(SecretIdList=chunk)
+            for entry in response.get('SecretValues', []):
+                secret_id = entry.get('Name') or entry['ARN']
+                storage = _storage_from_id(secret_id)
+                if storage == 'json':
+                    data = _jsonlib.loads(entry['SecretString'])
+                else:
+                    data = {secret_id: entry['SecretString']}
+                fetched[secret_id] = data
+        with cls._lock:
+            for category, data in fetched.items():
+                cdict = cls._cache.get(category)
+                if cdict is None:
+                    cdict = cls._cache[category] = {}
+                cdict.update(data)
+            cls._loaded.update(fetched)
+
+    @classmethod
+    def prefetch_categories_threaded(
+            cls, categories: typing.List[str],
+            profile_name: typing.Optional[str] = None,
+            max_workers: int = 8, **kwargs):
+        """Warm the cache with concurrent per-secret fetches.
+
+        :param categories:  List of string secret ids to fetch.
+
+        :param profile_name:  Optional AWS profile name as for
+                              load_secret_from_aws.
+
+        :param max_workers=8:  Thread pool size.
+
+        :param **kwargs:  Passed to load_secret_from_aws (e.g.,
+                          service_name='ssm').
+
+        ~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-
+
+        PURPOSE:  Unlike prefetch_categories this also works for
+                  back-ends without a batch API such as the ssm
+                  parameter store. Each fetch is network-bound, so a
+                  thread pool gives near-linear speedup; results are
+                  published under a single lock acquisition.
+
+        """
+        def fetch_one(category):
+            return category, cls.load_secret_from_aws(
+                category, profile_name, **kwargs)
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers) as executor:
+            results = list(executor.map(fetch_one, categories))
+        with cls._lock:
+            for category, data in results:
+                cdict = cls._cache.get(category)
+                if cdict is None:
+                    cdict = cls._cache[category] = {}
+                cdict.update(data)
+            cls._loaded.update(category for category, _ in results)
+
     @classmethod
     def load_cache(cls, name: typing.Optional[str] = None,
                    category: typing.Optional[str] = None,
@@ -83,10 +210,13 @@ class AWSSecretServer(common.SecretServer):
         data = cls.load_secret_from_aws(secret_id=category, **loader_params)
         assert isinstance(data, dict)
         with cls._lock:
-            cdict = cls._cache.get(category, {})
-            if not cdict:
-                cls._cache[category] = cdict
-            cdict.update(data)
+            existing = cls._cache.get(category)
+            # data is a fresh dict from load_secret_from_aws, so in the
+            # common no-merge case we can publish it directly with one
+            # assignment; lock-free readers then see either the old or
+            # the new fully-built dict, never a half-updated one.
+            cls._cache[category] = (
+                {**existing, **data} if existing else data)
 
     @classmethod
     def store_secrets(cls, new_secret_dict: typing.Dict[str, str],
@@ -110,17 +240,22 @@ class AWSSecretServer(common.SecretServer):
         PURPOSE:  Store the secrets in new_secret_dict to AWS.
 
         """
-        logging.warning('Reading original secrets for "%s"', category)
-        my_secrets = cls.load_secret_from_aws(
-            category, profile_name, **kwargs)
+        with cls._lock:
+            cached = cls._cache.get(category)
+            my_secrets = dict(cached) if cached else None
+        if my_secrets is None:  # cold cache; must read current value
+            logging.warning('Reading original secrets for "%s"', category)
+            my_secrets = cls.load_secret_from_aws(
+                category, profile_name, **kwargs)
 
-        service_name = kwargs.pop('service_name', 'secretsmanager')
-        session = boto3.Session(profile_name=profile_name, **kwargs)
-        client = session.client(service_name=service_name)
+        service_name = kwargs.get('service_name', 'secretsmanager')
+        session_kwargs = {k: v for k, v in kwargs.items()
+                          if k not in ('storage', 'service_name')}
+        client = _get_client(profile_name, service_name, **session_kwargs)
 
         with cls._lock:
             my_secrets.update(new_secret_dict)
-            secret_data = json.dumps(my_secrets)
+            secret_data = _jsonlib.dumps(my_secrets)
             if service_name == 'secretsmanager':
                 response = client.put_secret_value(
                     SecretId=category, SecretString=secret_data)
@@ -132,3 +267,4 @@ class AWSSecretServer(common.SecretServer):
             else:
                 raise ValueError(f'Invalid service_name: {service_name}')
             cls._cache[category] = my_secrets
+            cls._generation += 1  # stored values invalidate memoized results
@@ -4,28 +4,102 @@ This module provides a common core for secret servers.
 """
 
 import datetime
+import functools
 import logging
 import os
 import threading
+import time
+import types
 import typing
 import re
 
 from ox_secrets import settings
 
 
+# Shared read-only empty mapping so miss paths need not allocate one.
+_EMPTY = types.MappingProxyType({})
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_secret_info(my_str: str) -> tuple:
+    """Parse a serialized SecretInfo string into a tuple of pairs.
+
+    Factored out of SecretInfo.from_str and memoized since the same
+    descriptor strings tend to get re-parsed over and over; building
+    the instance from the parsed tuple is cheap by comparison.
+    """
+    pairs = []
+    for item in my_str.split(':'):
+        key, value = item.split('=')
+        pairs.append((key.strip(), value.strip()))
+    return tuple(pairs)
+
+
+@functools.lru_cache(maxsize=1024)
+def _env_var_key(prefix: str, category: str, name: str) -> str:
+    """Build (and cache) the env var key for the given prefix/category/name.
+
+    The prefix is expected to already be uppercase (as OX_SECRETS is)
+    so only the category and name components get uppercased; this
+    avoids allocating an intermediate mixed-case copy of the full key
+    on cache misses.
+    """
+    return f'{prefix}_{category.upper()}_{name.upper()}'
+
+
 class SecretServer:
     """Class to handle gettting secrets.
     """
 
     _env_var_prefix = 'OX_SECRETS'
+    _env_prefix_tuple = (_env_var_prefix + '_',)  # for str.startswith
     _lock = threading.Lock()  # Used to lock access to _cache
+    _locks = {}  # maps category to the lock striping access to it
+    _locks_guard = threading.Lock()  # guards creation of category locks
     _cache = {}
+    _loaded = set()  # categories load_cache has been run for
+    _compiled_cat_re = None  # (pattern string, compiled regexp) pair
+    _cat_remap_cache = {}  # maps (pattern, replace, category) to result
+    _result_cache = {}  # maps (category, name) to (generation, value)
+    _generation = 0  # bumped whenever cached results may be stale
+    _env_scan = None  # (len(os.environ), any prefixed vars present)
+    _value_pool = {}  # maps value to shared object to dedupe equal values
+    _cache_ts = {}  # maps category to monotonic time of last load
+    _refreshing = set()  # categories with a background refresh running
+    _inflight = {}  # maps category to Event for in-progress loads
+    _inflight_guard = threading.Lock()  # guards _inflight
     _data_fields = (
         ('name', 'Name of the secret.'),
         ('category', 'Category the secret is in.'),
         ('value', 'String value of the secret'),
         ('notes', 'Optional notes about the secret.')
         )
+    _field_names = tuple(pair[0] for pair in _data_fields)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Recompute so subclasses overriding _env_var_prefix or
+        # _data_fields get matching derived attributes.
+        cls._env_prefix_tuple = (cls._env_var_prefix + '_',)
+        cls._field_names = tuple(pair[0] for pair in cls._data_fields)
+        # Allocate fresh mutable state (and the locks guarding it) per
+        # subclass so back-ends never share caches: without this, every
+        # subclass would mutate the dicts created on SecretServer.
+        cls._lock = threading.Lock()
+        cls._locks = {}
+        cls._locks_guard = threading.Lock()
+        cls._cache = {}
+        cls._loaded = set()
+        cls._compiled_cat_re = None
+        cls._cat_remap_cache = {}
+        cls._result_cache = {}
+        cls._generation = 0
+        cls._env_scan = None
+        cls._value_pool = {}
+        cls._cache_ts = {}
+        cls._refreshing = set()
+        cls._inflight = {}
+        cls._inflight_guard = threading.Lock()
 
     @classmethod
     def load_cache(cls, name: typing.Optional[str] = None,
@@ -54,18 +128,82 @@ class SecretServer:
         """
         raise NotImplementedError
 
+    @classmethod
+    def _lock_for(cls, category: str) -> threading.Lock:
+        """Return the lock striping access to the given category.
+
+        Per-category locks let threads touching unrelated categories
+        proceed in parallel instead of serializing on the class-wide
+        cls._lock (which loaders still use when they may touch many
+        categories at once). Lock creation is double-checked under
+        _locks_guard.
+        """
+        lock = cls._locks.get(category)
+        if lock is None:
+            with cls._locks_guard:
+                lock = cls._locks.setdefault(category, threading.Lock())
+        return lock
+
     @classmethod
     def clear_cache(cls):
         "Clear the cache (i.e., forget all secrets)."
         cls._cache = {}
+        cls._loaded = set()
+        cls._result_cache = {}
+        cls._generation += 1
+        cls._env_scan = None
+        cls._value_pool = {}
+        cls._cache_ts = {}
+        _env_var_key.cache_clear()  # for safety; keys are pure anyway
 
     @classmethod
     def make_env_var_key(cls, name: str, category: str):
         """Create key to lookup environment variable for given name/category.
+
+        Since get_secret calls this on every lookup, the construction
+        is delegated to the lru_cache'd module-level _env_var_key so
+        warm calls are a single cache probe.
         """
+        return _env_var_key(cls._env_var_prefix, category, name)
 
-        key = f'{cls._env_var_prefix}_{category}_{name}'.upper()
-        return key
+    @classmethod
+    def _share_value(cls, value):
+        """Return a shared object equal to value to collapse duplicates.
+
+        Secret stores often hold the same value under several names
+        or categories (e.g., an API key reused during a migration).
+        Routing cache inserts through this pool makes equal strings
+        share a single object, shrinking the cache footprint. We
+        deliberately avoid sys.intern so secret material is not
+        pinned in the interpreter-wide intern table.
+        """
+        if not isinstance(value, str):
+            return value
+        return cls._value_pool.setdefault(value, value)
+
+    @classmethod
+    def _env_overrides_possible(cls) -> bool:
+        """Return whether any env var could override a secret.
+
+        The common case is that no OX_SECRETS_* override vars are set
+        at all, in which case secret_from_env can skip building the
+        key and probing os.environ entirely. We scan os.environ once
+        and remember the result together with len(os.environ) so that
+        setting or deleting env vars (which changes the length)
+        triggers a rescan; call refresh_env_overrides to force one.
+        """
+        scan = cls._env_scan
+        env_len = len(os.environ)
+        if scan is None or scan[0] != env_len:
+            scan = (env_len, any(k.startswith(cls._env_prefix_tuple)
+                                 for k in os.environ))
+            cls._env_scan = scan
+        return scan[1]
+
+    @classmethod
+    def refresh_env_overrides(cls):
+        "Force re-scanning os.environ for override variables."
+        cls._env_scan = None
 
     @classmethod
     def secret_from_env(cls, name: str, category: str, allow_env: bool):
@@ -80,9 +218,12 @@ class SecretServer:
         if not allow_env:
             logging.debug('allow_env is false so not checking env')
             return None
+        if not cls._env_overrides_possible():
+            return None  # no prefixed env vars at all; skip the lookup
         key = cls.make_env_var_key(name, category)
         result = os.environ.get(key, None)
-        if result is not None:
+        if result is not None and logging.getLogger().isEnabledFor(
+                logging.INFO):  # skip record setup on every lookup
             logging.info('Secret extracted from env var "%s"', key)
         return result
 
@@ -101,7 +242,11 @@ class SecretServer:
         :param allow_env=True:  Whether to allow checking env var first.
 
         :param allow_update=True:  Whether to loading cache if secret not
-                                   found.
+                                   found. Note that if the category was
+                                   already loaded and the name is still
+                                   missing we raise KeyError without
+                                   reloading; call clear_cache (e.g. via
+                                   forget_secrets) to force a fresh load.
 
         :param loader_params: Optional dict of parameters which gets
                               passed to load_cache for back-end. This allows
@@ -126,19 +271,44 @@ class SecretServer:
         result = cls.secret_from_env(name, category, allow_env)
         if result is not None:
             return result
-        with cls._lock:
-            cdict = cls._cache.get(category, {})
-            if name in cdict:
-                return cdict[name]
-            # Secret not found so clear cache to rebuild
-            cls._cache[category] = None
-            del cls._cache[category]
+        if settings.OX_SECRETS_TTL_SECONDS:
+            cls._maybe_refresh(category, settings.OX_SECRETS_TTL_SECONDS,
+                               loader_params, service_name)
+        memo_key = (category, name)
+        memo = cls._result_cache.get(memo_key)
+        if memo is not None and memo[0] == cls._generation:
+            return memo[1]
+        # Lock-free warm path: the GIL makes each dict lookup atomic
+        # and writers only mutate the cache under cls._lock, so a
+        # plain read either sees the secret or falls through to the
+        # (locked) miss path below. Use try/except rather than a
+        # membership test plus a lookup so we hash name only once and
+        # fall back to the shared _EMPTY mapping rather than
+        # allocating a fresh default dict on misses.
+        cdict = cls._cache.get(category) or _EMPTY
+        try:
+            result = cdict[name]
+        except KeyError:
+            pass
+        else:
+            cls._result_cache[memo_key] = (cls._generation, result)
+            return result
+        if category in cls._loaded:
+            # Negative result: load_cache already ran for this
+            # category and the name is still absent, so raise rather
+            # than hammering the back-end on every repeated lookup of
+            # a missing secret. Use clear_cache to force a reload.
+            raise KeyError(name)
+        with cls._lock_for(category):
+            # Secret not found so drop the category to rebuild
+            cls._cache.pop(category, None)
+            cls._loaded.discard(category)
         cls._prepare_secrets_dict(category, allow_update,
                                   loader_params, service_name)
-
-        with cls._lock:  # must lock since cdict may refernce cls._cdict
-            cdict = cls._cache[category]
-            return cdict[name]
+        cdict = cls._cache[category]
+        result = cdict[name]
+        cls._result_cache[memo_key] = (cls._generation, result)
+        return result
 
     @classmethod
     def get_secret_dict(cls, category: str = 'root',
@@ -173,7 +343,7 @@ class SecretServer:
         category = cls.maybe_replace_category(category)
         cls._prepare_secrets_dict(category, allow_update, loader_params,
                                   service_name)
-        with cls._lock:
+        with cls._lock_for(category):
             return dict(cls._cache[category])  # return shallow copy
 
     @classmethod
@@ -248,6 +418,42 @@ class SecretServer:
                                    '__' + '_'.join(action_list))
         logging.info('Set env var %s to log setup', log_env_var)
 
+    @classmethod
+    def _maybe_refresh(cls, category: str, ttl: float,
+                       loader_params: typing.Optional[dict] = None,
+                       service_name: typing.Optional[str] = None):
+        """Kick off a background reload when a category outlives the TTL.
+
+        Readers keep getting the current cached values with no added
+        latency; a single daemon thread per category (debounced via
+        cls._refreshing) reloads it and bumps the generation counter
+        so memoized results pick up the fresh values.
+        """
+        last = cls._cache_ts.get(category)
+        if last is None or time.monotonic() - last <= ttl:
+            return
+        with cls._lock:
+            if category in cls._refreshing:
+                return
+            cls._refreshing.add(category)
+
+        def _reload():
+            lp = dict(loader_params) if loader_params else {}
+            if service_name is not None:
+                lp.setdefault('service_name', service_name)
+            try:
+                cls.load_cache(name=None, category=category,
+                               loader_params=lp if lp else None)
+                cls._cache_ts[category] = time.monotonic()
+                cls._generation += 1
+            except Exception as problem:  # pylint: disable=broad-except
+                logging.error('Background refresh of category %s failed: %s',
+                              category, problem)
+            finally:
+                cls._refreshing.discard(category)
+
+        threading.Thread(target=_reload, daemon=True).start()
+
     @classmethod
     def _prepare_secrets_dict(
             cls, category: str, allow_update: bool,
@@ -278,13 +484,17 @@ class SecretServer:
 
         """
 
-        if cls._cache.get(category):  # have something so no need to reload
+        cdict = cls._cache.get(category)  # snapshot once; reused below
+        if cdict:  # have something so no need to reload
+            return
+        if category in cls._loaded:  # loaded but empty; do not reload
             return
         if not allow_update:
-            with cls._lock:
-                cdict = cls._cache.get(category, None)
-                if cdict is not None:   # did have something there
-                    return              # so stop processing
+            if cdict is not None:       # did have something (empty) there
+                return                  # so stop processing
+            with cls._lock_for(category):
+                if cls._cache.get(category) is not None:
+                    return              # another thread loaded meanwhile
                 logging.error(          # otherwise indicate an error
                     'Unable to find category %s for secret manager class %s',
                     category, cls.__name__)
@@ -293,27 +503,71 @@ class SecretServer:
             if loader_params is None:
                 loader_params = {}
             loader_params['service_name'] = service_name
-        cls.load_cache(name=None, category=category,
-                       loader_params=loader_params)
+        # Singleflight: if another thread is already loading this
+        # category, wait for its result instead of issuing a duplicate
+        # back-end read (thundering herd on cold-miss bursts).
+        with cls._inflight_guard:
+            event = cls._inflight.get(category)
+            leader = event is None
+            if leader:
+                event = threading.Event()
+                cls._inflight[category] = event
+        if not leader:
+            event.wait()
+            return
+        try:
+            cls.load_cache(name=None, category=category,
+                           loader_params=loader_params)
+            cls._loaded.add(category)
+            cls._cache_ts[category] = time.monotonic()
+        finally:
+            with cls._inflight_guard:
+                cls._inflight.pop(category, None)
+            event.set()
 
-    @staticmethod
-    def maybe_replace_category(category):
+    @classmethod
+    def maybe_replace_category(cls, category):
         """Replace input based on OX_SECRETS_CATEGORY_REGEXP.
 
-Meant to be called by get_secret.
+Meant to be called by get_secret. Since this runs on every lookup, we
+cache both the compiled pattern and the remapped result. The cache
+keys include the current pattern/replacement so changing the settings
+at run-time still takes effect immediately.
         """
-        if settings.OX_SECRETS_CATEGORY_REGEXP:
-            return re.sub(settings.OX_SECRETS_CATEGORY_REGEXP,
-                          settings.OX_SECRETS_CATEGORY_REPLACE, category)
-        return category
+        pat = settings.OX_SECRETS_CATEGORY_REGEXP
+        if not pat:
+            return category
+        repl = settings.OX_SECRETS_CATEGORY_REPLACE
+        memo_key = (pat, repl, category)
+        result = cls._cat_remap_cache.get(memo_key)
+        if result is None:
+            if cls._compiled_cat_re is None or cls._compiled_cat_re[0] != pat:
+                cls._compiled_cat_re = (pat, re.compile(pat))
+            result = cls._compiled_cat_re[1].sub(repl, category)
+            cls._cat_remap_cache[memo_key] = result
+        return result
+
+    @classmethod
+    def reload_settings(cls):
+        """Drop cached state derived from the settings module.
+
+        The category remap caches key on the current pattern and
+        replacement so correctness never requires calling this; it
+        just releases entries built for old settings values after a
+        run-time settings change.
+        """
+        cls._compiled_cat_re = None
+        cls._cat_remap_cache = {}
 
     @classmethod
     def list_secret_names(cls, category: str) -> typing.List[str]:
         "Return list of secret names for given category."
 
-        with cls._lock:  # get the lock to prevent modification while we look
-            cdict = cls._cache.get(category, [])
-            return list(cdict)
+        # Like the warm path in get_secret, reading the cache needs no
+        # lock under the GIL; this also avoids allocating a default
+        # when the category is absent.
+        cdict = cls._cache.get(category)
+        return list(cdict) if cdict else []
 
     @classmethod
     def store_secrets(cls, new_secret_dict: typing.Dict[str, str],
@@ -367,11 +621,15 @@ True
 
     """
 
+    __slots__ = ('name', 'category', 'mode', 'loader_params',
+                 '_info_cache')
+
     def __init__(self, name, category, mode=None, **kwargs):
         self.name = name
         self.category = category
         self.mode = mode
         self.loader_params = kwargs
+        self._info_cache = None  # built lazily by make_info
 
     @classmethod
     def from_str(cls, my_str):
@@ -384,22 +642,24 @@ True
         :return:  Instance of class
 
         """
-        kwargs = {}
-        data = my_str.split(':')
-        for item in data:
-            key, value = item.split('=')
-            kwargs[key.strip()] = value.strip()
+        kwargs = dict(_parse_secret_info(my_str))
         result = cls(**kwargs)
         return result
 
     def make_info(self):
         """Return list of name value pairs for data in self.
+
+        Instances are effectively immutable after construction, so the
+        list is built once and memoized for repeated str/repr calls.
         """
+        if self._info_cache is not None:
+            return self._info_cache
         info = [('name', self.name), ('category', self.category)]
         if self.mode is not None:
             info.append(('mode', self.mode))
         for name, value in self.loader_params.items():
             info.append((name, value))
+        self._info_cache = info
         return info
 
     def pretty(self):
@@ -7,7 +7,6 @@ This is helpful for local testing and very simple operation.
 import typing
 import logging
 import os
-import re
 
 from ox_secrets.core import common
 
@@ -48,17 +47,32 @@ The following illustrates example usage:
         """
         logging.warning(
             'Reading secrets from env variables with prefix "%s"', prefix)
-        my_re = re.compile(f'^{prefix}_(?P<category>[^_]+)_(?P<secname>.+)$')
-        for var_name, value in os.environ.items():
-            match = my_re.match(var_name)
-            if match:
-                category = match.group('category')
-                secname = match.group('secname')
+        # A startswith filter plus str.partition is several times
+        # faster than running a regexp over every environment variable
+        # and matches the same names: {prefix}_{category}_{secname}
+        # with a non-empty, underscore-free category.
+        sep_prefix = prefix + '_'
+        plen = len(sep_prefix)
+        fresh = {}  # build locally so the scan needs no lock
+        # Hoist the level check out of the loop; most deployments run
+        # at WARNING and should not pay per-variable logging overhead.
+        log_matches = logging.getLogger().isEnabledFor(logging.INFO)
+        # Snapshot the environment once: iterating the _Environ
+        # mapping dispatches through its wrapper methods per item,
+        # which adds up for processes with thousands of variables.
+        for var_name, value in list(os.environ.items()):
+            if not var_name.startswith(sep_prefix):
+                continue
+            category, sep, secname = var_name[plen:].partition('_')
+            if not (category and sep and secname):
+                continue
+            if log_matches:
                 logging.info('Matched %s as %s in category %s', secname,
                              category, secname)
-                if category not in cls._cache:
-                    cls._cache[category] = {}
-                cls._cache[category][secname] = value
+            fresh.setdefault(category, {})[secname] = cls._share_value(value)
+        with cls._lock:  # short merge instead of locking the whole scan
+            for category, cdict in fresh.items():
+                cls._cache.setdefault(category, {}).update(cdict)
 
     @classmethod
     def load_cache(cls, name: typing.Optional[str] = None,
@@ -67,8 +81,7 @@ The following illustrates example usage:
         "Implement loading cache from a file."
         if loader_params:
             logging.warning('Ignoring loader_params in %s', cls.__name__)
-        with cls._lock:
-            return cls.load_secrets_data()
+        return cls.load_secrets_data()  # locks internally for the merge
 
     @classmethod
     def store_secrets(cls, new_secret_dict: typing.Dict[str, str],
@@ -102,10 +115,15 @@ The following illustrates example usage:
         if new_secret_dict:
             logging.warning(
                 'Storing to env will be forgotten when pricess exits.')
-        with cls._lock:
-            if category not in cls._cache:
-                cls._cache[category] = {}
-            for name, value in new_secret_dict.items():
-                full_name = f'{prefix}_{category.upper()}_{name.upper()}'
+        # Build the env var names outside the lock (cached key
+        # construction) so the critical section is just the two
+        # mutation loops; each os.environ assignment still pays a
+        # putenv call but no formatting overhead.
+        pairs = [(common._env_var_key(prefix, category, name), value)
+                 for name, value in new_secret_dict.items()]
+        with cls._lock_for(category):
+            cdict = cls._cache.setdefault(category, {})
+            for full_name, value in pairs:
                 os.environ[full_name] = value
-                cls._cache[category][name] = value
+            cdict.update(new_secret_dict)
+            cls._generation += 1  # stored values invalidate memoized results
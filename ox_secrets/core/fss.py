@@ -5,23 +5,68 @@ This is helpful for local testing and very simple operation.
 """
 
 
+import functools
+import io
 import logging
-import csv
+import mmap
 import os
+import sys
+import tempfile
+import threading
 import typing
-import json
+
+# csv and the _jsonlib helper are imported lazily inside the functions
+# that parse or write files (mirroring the delayed boto3 import for
+# aws) so env-only deployments that never touch a secrets file skip
+# their import cost.
+
+try:  # stream very large .json files instead of materializing them
+    import ijson
+except ImportError:
+    ijson = None
 
 from ox_secrets import settings
 from ox_secrets.core import common
 
+try:  # prefer the mypyc-compiled fill loop when it has been built
+    from ox_secrets.core._loader_c import populate_cache
+except ImportError:
+    from ox_secrets.core._loader import populate_cache
+
+# Size in bytes above which a .json secrets file is streamed with
+# ijson (when installed) rather than slurped and bulk-parsed.
+_STREAM_JSON_THRESHOLD = 1 << 20
+
+# Size in bytes above which a .csv secrets file is decoded in one
+# shot from an mmap of the file instead of the chunked text-io read.
+_MMAP_THRESHOLD = 1 << 16
+
+
+@functools.lru_cache(maxsize=4)
+def _resolved_secrets_file(settings_file: str) -> str:
+    """Resolve the secrets filename with OX_SECRETS_FILE env override.
+
+    Keyed on the current settings value so run-time changes to
+    settings.OX_SECRETS_FILE take effect immediately; the env var
+    lookup itself is only paid once per distinct settings value
+    (clear_cache drops the memo in case the env var changes).
+    """
+    return os.environ.get('OX_SECRETS_FILE', settings_file)
+
 
 class FileSecretServer(common.SecretServer):
     """Class to handle getting secrets from file.
     """
 
+    _staged = {}  # maps filename to {category: {name: value}} parsed rows
+    _headers = {}  # maps filename to tuple of on-disk CSV header columns
+    _file_fingerprint = {}  # maps filename to (mtime_ns, size) at parse
+    _file_lock = threading.Lock()  # serializes secrets file I/O
+
     @classmethod
     def load_secrets_file(cls, filename=None, encoding='utf8',
-                          file_type=None, default_category='root'):
+                          file_type=None, default_category='root',
+                          category=None):
         """Load secrets file from given filename.
 
         :param filename=None:    Optional filename for secrets. This
@@ -34,40 +79,243 @@ class FileSecretServer(common.SecretServer):
 
         :param encoding='utf8':  Default encoding for opening files.
 
-        :param file_type:  Either .csv or .json or None if you want to
-                           select based on file extension.
+        :param file_type:  Either .csv, .json, .ndjson (one JSON dict
+                           of name value pairs per line), .raw, or None
+                           if you want to select based on file
+                           extension.
 
         :param default_category='root':  Category to use when cannot
                                          otherwise find it.
 
+        :param category=None:  Optional category the caller needs. If
+                               provided for a CSV file, only that
+                               category is published to the cache; the
+                               other parsed rows are staged per file
+                               so later categories need no re-read. If
+                               None we load everything.
+
         ~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-
 
         PURPOSE:  Fill cls._cache with data from secrets file.
 
         """
         if filename is None:
-            filename = os.environ.get(
-                'OX_SECRETS_FILE', settings.OX_SECRETS_FILE)
+            filename = _resolved_secrets_file(settings.OX_SECRETS_FILE)
         logging.warning('Opening secrets file "%s"', filename)
-        with cls._lock, open(filename, 'r', encoding=encoding) as sfd:
-            if file_type is None:
-                file_type = os.path.splitext(filename)[-1].lower()
+        if file_type is None:
+            file_type = os.path.splitext(filename)[-1].lower()
+        # Stat the file so an unchanged CSV can be served from its
+        # staged snapshot with no I/O at all, and so a file changed
+        # behind our back invalidates the snapshot.
+        try:
+            fstat = os.stat(filename)
+            fprint = (fstat.st_mtime_ns, fstat.st_size)
+        except OSError:
+            fprint = None
+        if cls._file_fingerprint.get(filename) != fprint:
+            cls._staged.pop(filename, None)  # changed on disk; stale
+        fresh = {}
+        staged = cls._staged.get(filename)
+        if staged is None and file_type == '.csv':
+            staged = cls._load_snapshot(filename, fprint)
+            if staged is not None:  # warm-start from pickled snapshot
+                cls._staged[filename] = staged
+                cls._file_fingerprint[filename] = fprint
+        if staged is not None and file_type == '.csv':
+            # Unchanged since last parse; serve from the snapshot.
+            cls._publish_staged(staged, category, fresh)
+            return cls._merge_fresh(fresh)
+        # Parse into a local staging dict holding only the file lock
+        # so readers of already-cached categories are not stalled
+        # behind file I/O; just the final merge below needs cls._lock.
+        with cls._file_lock, open(
+                filename, 'r', encoding=encoding, buffering=1 << 20,
+                newline='' if file_type == '.csv' else None) as sfd:
             if file_type == '.raw':
-                contents = [{'name': default_category, 'value': sfd.read()}]
+                fresh.setdefault(default_category, {})[
+                    default_category] = sfd.read()
             elif file_type == '.csv':
-                contents = list(csv.DictReader(sfd))
+                cls._load_csv(sfd, filename, default_category, category,
+                              fresh, encoding)
             elif file_type == '.json':
-                contents = [{'name': k, 'value': v}
-                            for k, v in json.load(sfd).items()]
+                # Insert straight into staging rather than building
+                # an intermediate list of per-entry dicts first; one
+                # bulk read feeds the fastest installed JSON parser.
+                # Multi-MB files are streamed pair-by-pair via ijson
+                # when installed so peak memory stays near flat.
+                from ox_secrets.core import _jsonlib  \
+                    # pylint: disable=import-outside-toplevel
+                cdict = fresh.setdefault(default_category, {})
+                if ijson is not None and os.fstat(
+                        sfd.fileno()).st_size > _STREAM_JSON_THRESHOLD:
+                    for name, value in ijson.kvitems(sfd, ''):
+                        cdict[name] = value
+                else:
+                    for name, value in _jsonlib.loads(sfd.read()).items():
+                        cdict[name] = value
+            elif file_type == '.ndjson':
+                # Newline-delimited JSON: each line is a dict of name
+                # value pairs for default_category; later lines win.
+                from ox_secrets.core import _jsonlib  \
+                    # pylint: disable=import-outside-toplevel
+                cdict = fresh.setdefault(default_category, {})
+                for line in sfd.read().splitlines():
+                    if line.strip():
+                        cdict.update(_jsonlib.loads(line))
             else:
                 raise ValueError(
                     f'Cannot handle secrets file_type={file_type}')
-            for line in contents:
-                line_category = line.get('category', default_category)
-                if line_category not in cls._cache:
-                    cls._cache[line_category] = {}
-                cls._cache[line_category][line['name']] = line[
-                    'value']
+        if fprint is not None:
+            cls._file_fingerprint[filename] = fprint
+            if file_type == '.csv':
+                cls._save_snapshot(filename, fprint,
+                                   cls._staged.get(filename))
+        cls._merge_fresh(fresh, bump=True)
+
+    @classmethod
+    def _merge_fresh(cls, fresh, bump=False):
+        """Merge a parsed staging dict into cls._cache under the lock.
+
+        :param bump:  Bump the generation counter; pass True when
+                      freshly re-parsed content may supersede values
+                      that memoized lookups still hold.
+        """
+        with cls._lock:
+            for line_category, cdict in fresh.items():
+                target = cls._cache.setdefault(line_category, {})
+                for name, value in cdict.items():
+                    target[name] = cls._share_value(value)
+            if bump:
+                cls._generation += 1
+
+    @classmethod
+    def _publish_staged(cls, staged, category, fresh):
+        "Copy the requested category (or all) from a snapshot to fresh."
+        if category is None:
+            for line_category, cdict in staged.items():
+                fresh.setdefault(line_category, {}).update(cdict)
+        else:
+            cdict = staged.get(category)
+            if cdict:
+                fresh.setdefault(category, {}).update(cdict)
+
+    @classmethod
+    def _load_snapshot(cls, filename, fprint):
+        """Return staged rows from the pickled snapshot if still current.
+
+        Only consulted when settings.OX_SECRETS_PICKLE_CACHE is true;
+        a snapshot whose recorded source fingerprint does not match
+        fprint (or that cannot be read) is ignored.
+        """
+        if not settings.OX_SECRETS_PICKLE_CACHE or fprint is None:
+            return None
+        import pickle  # pylint: disable=import-outside-toplevel
+        try:
+            with open(filename + '.pkl', 'rb') as pfd:
+                snap = pickle.load(pfd)
+            if snap.get('src_fingerprint') == fprint:
+                header = snap.get('header')
+                if header is not None:
+                    cls._headers[filename] = header
+                return snap['staged']
+        except (OSError, KeyError, EOFError, AttributeError,
+                pickle.UnpicklingError):
+            pass
+        return None
+
+    @classmethod
+    def _save_snapshot(cls, filename, fprint, staged):
+        "Atomically pickle staged rows beside the secrets file."
+        if (not settings.OX_SECRETS_PICKLE_CACHE or fprint is None
+                or staged is None):
+            return
+        import pickle  # pylint: disable=import-outside-toplevel
+        try:
+            tmp_fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(filename)),
+                suffix='.tmp')
+            with os.fdopen(tmp_fd, 'wb') as pfd:
+                pickle.dump(
+                    {'src_fingerprint': fprint, 'staged': staged,
+                     'header': cls._headers.get(filename)},
+                    pfd, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, filename + '.pkl')
+        except OSError as problem:
+            logging.warning('Unable to write snapshot for %s: %s',
+                            filename, problem)
+
+    @classmethod
+    def invalidate(cls, filename: typing.Optional[str] = None):
+        """Drop fingerprint and snapshot so the next load re-reads.
+
+        :param filename=None:  Specific file to invalidate, or None
+                               for all files.
+        """
+        if filename is None:
+            cls._file_fingerprint = {}
+            cls._staged = {}
+            cls._headers = {}
+        else:
+            cls._file_fingerprint.pop(filename, None)
+            cls._staged.pop(filename, None)
+            cls._headers.pop(filename, None)
+
+    @classmethod
+    def _load_csv(cls, sfd, filename, default_category, category, fresh,
+                  encoding='utf8'):
+        """Parse an open CSV secrets file into the fresh staging dict.
+
+        The whole file is slurped in one read and parsed in a single
+        csv.reader pass using positional column indexes (no per-row
+        dict allocation); files past _MMAP_THRESHOLD are decoded in
+        one shot straight from an mmap of the file, skipping the
+        chunked text-io layer. The parsed rows are kept per filename
+        in cls._staged so that until the file's fingerprint changes,
+        later calls publish from the snapshot instead of re-reading
+        and re-parsing the file (load_secrets_file handles that fast
+        path). Stores to the file and clear_cache drop the snapshot.
+        """
+        import csv  # pylint: disable=import-outside-toplevel
+        data = None
+        if os.fstat(sfd.fileno()).st_size > _MMAP_THRESHOLD:
+            try:
+                with mmap.mmap(sfd.fileno(), 0,
+                               access=mmap.ACCESS_READ) as mapped:
+                    data = str(mapped, encoding)
+            except (ValueError, OSError):
+                data = None  # fall back to a plain read
+        if data is None:
+            data = sfd.read()
+        reader = csv.reader(io.StringIO(data))
+        header = next(reader, None)
+        if not header:
+            return
+        cls._headers[filename] = tuple(header)
+        col_idx = {col: i for i, col in enumerate(header)}
+        cat_i = col_idx.get('category')
+        name_i, value_i = col_idx['name'], col_idx['value']
+        staged = {}
+        # Intern the key strings: categories repeat across nearly
+        # every row and names recur on every lookup, so interning
+        # drops the duplicate allocations and lets later dict
+        # probes hit the pointer-equality fast path. Values are
+        # deliberately NOT interned (see _share_value) to avoid
+        # pinning secret material in the intern table. The fill
+        # loop itself runs in populate_cache (compiled if built).
+        populate_cache(staged, (
+            (sys.intern(row[cat_i]) if cat_i is not None
+             else default_category,
+             sys.intern(row[name_i]), row[value_i])
+            for row in reader if row), default_category)
+        cls._staged[filename] = staged
+        cls._publish_staged(staged, category, fresh)
+
+    @classmethod
+    def clear_cache(cls):
+        "Clear the cache along with any staged per-file snapshots."
+        super().clear_cache()
+        cls.invalidate()
+        _resolved_secrets_file.cache_clear()  # env var may have changed
 
     @classmethod
     def load_cache(cls, name: typing.Optional[str] = None,
@@ -76,7 +324,7 @@ class FileSecretServer(common.SecretServer):
         "Implement loading cache from a file."
         loader_params = loader_params if loader_params is not None else {}
         return cls.load_secrets_file(default_category=category,
-                                     **loader_params)
+                                     category=category, **loader_params)
 
     @classmethod
     def store_secrets(cls, new_secret_dict: typing.Dict[str, str],
@@ -85,6 +333,91 @@ class FileSecretServer(common.SecretServer):
         """
         cls.store_secrets_to_file(new_secret_dict, category, **storage_params)
 
+    @classmethod
+    def store_secrets_to_file_append(
+            cls, new_secret_dict: typing.Dict[str, str], category: str,
+            filename: typing.Optional[str] = None,
+            encoding: str = 'utf8'):
+        """Append secrets to the file without rewriting it.
+
+        :param new_secret_dict:  Dictionary of name value pairs for secrets.
+
+        :param category:  String category for secrets to store.
+
+        :param filename: Path to store secrets to.
+
+        :param encoding: Encoding for file.
+        ~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-~-
+
+        PURPOSE:  store_secrets_to_file rewrites the whole file on
+                  every store (O(file) bytes moved per update). This
+                  appends one row per secret instead; since
+                  load_secrets_file applies rows in order, later
+                  appended values simply clobber earlier ones when
+                  the cache is loaded. Call store_secrets_to_file
+                  occasionally to compact away the superseded rows.
+
+The appended rows follow the on-disk header's column order even
+when it is not the canonical one:
+
+>>> import tempfile, os
+>>> from ox_secrets.core.fss import FileSecretServer as fss
+>>> fn = tempfile.mktemp(suffix='.csv')
+>>> with open(fn, 'w') as fd:
+...     _ = fd.write('category,name,value,notes\\ncool,n1,v1,x\\n')
+>>> fss.clear_cache()
+>>> fss.store_secrets_to_file_append({'n2': 'v2'}, 'cool', filename=fn)
+>>> fss.load_secrets_file(fn)
+>>> fss.get_secret('n2', category='cool'), fss.get_secret(
+...     'n1', category='cool')
+('v2', 'v1')
+>>> os.remove(fn)
+>>> fss.clear_cache()
+
+        """
+        import csv  # pylint: disable=import-outside-toplevel
+        if filename is None:
+            filename = _resolved_secrets_file(settings.OX_SECRETS_FILE)
+        with cls._file_lock:
+            with open(filename, 'a+', encoding=encoding,
+                      newline='') as sfd:
+                writer = csv.writer(sfd)
+                if sfd.tell() == 0:  # new or empty file needs header
+                    header = cls._field_names
+                    writer.writerow(header)
+                else:  # existing file; its header dictates row layout
+                    sfd.seek(0)
+                    header = tuple(next(csv.reader(sfd), ()))
+                    sfd.seek(0, os.SEEK_END)
+                if header == cls._field_names:
+                    writer.writerows(
+                        (name, category, value, 'via store_secrets')
+                        for name, value in new_secret_dict.items())
+                else:
+                    # Respect the on-disk column order so the rows
+                    # appended here parse correctly on the next load.
+                    pos = {col: i for i, col in enumerate(header)}
+                    if not {'name', 'category', 'value'} <= pos.keys():
+                        raise ValueError(
+                            f'Cannot append to {filename}: header '
+                            f'{header} lacks name/category/value')
+                    rows = []
+                    for name, value in new_secret_dict.items():
+                        row = [''] * len(header)
+                        row[pos['name']] = name
+                        row[pos['category']] = category
+                        row[pos['value']] = value
+                        if 'notes' in pos:
+                            row[pos['notes']] = 'via store_secrets'
+                        rows.append(row)
+                    writer.writerows(rows)
+        with cls._lock:
+            if category in cls._cache:
+                cls._cache[category].update(new_secret_dict)
+            # File contents changed so snapshot/fingerprint are stale
+            cls.invalidate(filename)
+            cls._generation += 1  # stored values invalidate memoized results
+
     @classmethod
     def store_secrets_to_file(
             cls, new_secret_dict: typing.Dict[str, str], category: str,
@@ -103,35 +436,102 @@ class FileSecretServer(common.SecretServer):
 
         PURPOSE:  Store the secrets in new_secret_dict to filename.
 
+Files whose header order differs from the canonical
+name,category,value,notes are rewritten in canonical order (never
+blindly appended to) so no value is misfiled:
+
+>>> import tempfile, os
+>>> from ox_secrets.core.fss import FileSecretServer as fss
+>>> fn = tempfile.mktemp(suffix='.csv')
+>>> with open(fn, 'w') as fd:
+...     _ = fd.write('category,name,value,notes\\ncool,n1,v1,x\\n')
+>>> fss.clear_cache()
+>>> fss.load_secrets_file(fn)
+>>> fss.store_secrets_to_file({'n2': 'v2'}, 'cool', filename=fn)
+>>> fss.clear_cache()
+>>> fss.load_secrets_file(fn)
+>>> fss.get_secret('n2', category='cool'), fss.get_secret(
+...     'n1', category='cool')
+('v2', 'v1')
+>>> os.remove(fn)
+>>> fss.clear_cache()
+
         """
+        import csv  # pylint: disable=import-outside-toplevel
         if filename is None:
-            filename = os.environ.get(
-                'OX_SECRETS_FILE', settings.OX_SECRETS_FILE)
+            filename = _resolved_secrets_file(settings.OX_SECRETS_FILE)
+        # Fast path: when the parsed snapshot of the file shows the new
+        # rows collide with nothing on disk, appending is equivalent to
+        # the read-filter-rewrite below but only moves O(new) bytes.
+        # Only valid when the on-disk header is in canonical column
+        # order; otherwise fall through so the rewrite normalizes it.
+        staged = cls._staged.get(filename)
+        if staged is not None and cls._headers.get(
+                filename) == cls._field_names and not (
+                staged.get(category, {}).keys() & new_secret_dict.keys()):
+            return cls.store_secrets_to_file_append(
+                new_secret_dict, category, filename, encoding)
         logging.warning('Opening secrets file "%s"', filename)
         data = []
+        # The read-modify-write of the file only needs the file lock;
+        # readers of unrelated categories keep going while we do I/O
+        # and the short cache update below takes cls._lock.
+        with cls._file_lock:
+            fieldnames = cls._field_names
+            # 'a+' creates the file if needed in the same open used
+            # for reading (no exists/touch/reopen dance or the TOCTOU
+            # race between them); seek back to parse from the top.
+            with open(filename, 'a+', encoding=encoding,
+                      newline='') as sfd:
+                sfd.seek(0)
+                # csv.reader with positional indexes avoids the
+                # per-row dict allocation DictReader paid just to
+                # look up two known columns.
+                reader = csv.reader(sfd)
+                header = next(reader, None)
+                if header:
+                    idx = {col: i for i, col in enumerate(header)}
+                    name_i, cat_i = idx['name'], idx['category']
+                    for row in reader:
+                        if not row:
+                            continue
+                        if row[name_i] in new_secret_dict and row[
+                                cat_i] == category:
+                            logging.info('Replacing old value for %s/%s',
+                                         row[name_i], row[cat_i])
+                        else:
+                            if tuple(header) != fieldnames:  # fix order
+                                row = [row[idx[col]] if col in idx else ''
+                                       for col in fieldnames]
+                            data.append(row)
+            # Write to a sibling temp file and atomically swap it in
+            # so a crash mid-write can never leave a truncated secrets
+            # file and readers only ever see a complete old or new
+            # version. mkstemp also gives the rewrite 0600 permissions.
+            tmp_fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(filename)),
+                suffix='.tmp')
+            try:
+                with os.fdopen(tmp_fd, 'w', encoding=encoding,
+                               newline='') as sfd:
+                    # One writerows call loops over the rows in C
+                    # instead of a Python-level call per row.
+                    all_rows = [fieldnames]
+                    all_rows.extend(data)
+                    all_rows.extend(
+                        (name, category, value, 'via store_secrets')
+                        for name, value in new_secret_dict.items())
+                    csv.writer(sfd).writerows(all_rows)
+                    sfd.flush()
+                    os.fsync(sfd.fileno())
+                os.replace(tmp_path, filename)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
         with cls._lock:
-            if not os.path.exists(filename):
-                logging.warning('Creating empty file for %s.', filename)
-                with open(filename, 'a', encoding='utf8') as sfd:
-                    pass  # this just creates an empty file if necessary
-            with open(filename, 'r', encoding=encoding) as sfd:
-                reader = csv.DictReader(sfd)
-                for item in reader:
-                    if item['name'] in new_secret_dict and item[
-                            'category'] == category:
-                        logging.info('Replacing old value for %s/%s',
-                                     item['name'], item['category'])
-                    else:
-                        data.append(item)
-            with open(filename, 'w', encoding=encoding) as sfd:
-                writer = csv.DictWriter(sfd, fieldnames=[
-                    pair[0] for pair in cls._data_fields])
-                writer.writeheader()
-                for line in data:
-                    writer.writerow(line)
-                for name, value in new_secret_dict.items():
-                    writer.writerow({
-                        'name': name, 'category': category,
-                        'value': value, 'notes': 'via store_secrets'})
-                    if category in cls._cache:
-                        cls._cache[category][name] = value
+            cdict = cls._cache.get(category)
+            if cdict is not None:
+                cdict.update(new_secret_dict)
+            # File contents changed so snapshot/fingerprint are stale
+            cls.invalidate(filename)
+            cls._generation += 1  # stored values invalidate memoized results
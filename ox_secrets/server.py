@@ -1,6 +1,7 @@
 """High-level file to work with secret servers.
 """
 
+import functools
 import os
 import typing
 
@@ -8,28 +9,66 @@ from ox_secrets import settings
 from ox_secrets.core import common, fss, evs
 
 
+def _load_aws() -> common.SecretServer:
+    "Delayed import so boto3 need not be installed unless aws is used."
+    from ox_secrets.core import aws  \
+        # pylint:disable=import-outside-toplevel
+    return aws.AWSSecretServer
+
+
+# Table dispatch for known modes mapping each mode string to a thunk
+# returning the server class; 'aws' lazy-imports boto3 on first use.
+_SERVER_TABLE = {
+    'fss': lambda: fss.FileSecretServer,
+    'file': lambda: fss.FileSecretServer,
+    'evs': lambda: evs.EnvVarSecretServer,
+    'env': lambda: evs.EnvVarSecretServer,
+    'aws': _load_aws,
+    }
+
+
+@functools.lru_cache(maxsize=8)
+def _resolve_mode(mode: str) -> common.SecretServer:
+    "Map a lower-case mode string to its server class (cached)."
+    thunk = _SERVER_TABLE.get(mode)
+    if thunk is None:
+        raise ValueError(f'Invalid secret server mode "{mode}"')
+    return thunk()
+
+
+def _compute_default_mode() -> str:
+    "Resolve the default mode from the env var then settings."
+    return os.environ.get(
+        'OX_SECRETS_MODE', settings.OX_SECRETS_MODE).lower()
+
+
+# Snapshot of the default mode, already lower-cased, so get_server
+# skips the environ lookup and .lower() allocation on every call.
+_DEFAULT_MODE = _compute_default_mode()
+
+
+def refresh_defaults():
+    """Re-resolve defaults frozen at import time.
+
+    Call this after changing settings.OX_SECRETS_MODE or the
+    OX_SECRETS_MODE environment variable at run-time so get_server
+    picks up the new default.
+    """
+    global _DEFAULT_MODE  # pylint: disable=global-statement
+    _DEFAULT_MODE = _compute_default_mode()
+
+
 def get_server(mode: typing.Optional[str] = None) -> common.SecretServer:
     """Get the default secret server.
 
     :param mode:  Optional string mode specifying secret server to get. If
-                  None, then we try OX_SECRETS_MODE from env and then
-                  settings.OX_SECRETS_MODE.
+                  None, then we use OX_SECRETS_MODE from env and then
+                  settings.OX_SECRETS_MODE as sampled at import time
+                  (call refresh_defaults() after changing either at
+                  run-time).
 
     """
-    if not mode:
-        mode = os.environ.get('OX_SECRETS_MODE', settings.OX_SECRETS_MODE)
-    mode = mode.lower()
-    if mode in ['fss', 'file']:
-        return fss.FileSecretServer
-    if mode in ['evs', 'env']:
-        return evs.EnvVarSecretServer
-    if mode == 'aws':
-        # delayed import so boto3 does not need to be installed if
-        # the aws secret server is never used
-        from ox_secrets.core import aws  \
-            # pylint:disable=import-outside-toplevel
-        return aws.AWSSecretServer
-    raise ValueError(f'Invalid secret server mode "{mode}"')
+    return _resolve_mode(mode.lower() if mode else _DEFAULT_MODE)
 
 
 def get_secret(name: str, category: str = 'root',
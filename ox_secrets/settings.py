@@ -27,3 +27,23 @@ OX_SECRETS_CATEGORY_REGEXP = os.environ.get(
     'OX_SECRETS_CATEGORY_REGEXP', None)
 OX_SECRETS_CATEGORY_REPLACE = os.environ.get(
     'OX_SECRETS_CATEGORY_REPLACE', None)
+
+# If set to a number of seconds (either below at run-time or via the
+# environment variable OX_SECRETS_TTL_SECONDS), categories older than
+# this are refreshed in the background the next time they are read so
+# rotated secrets get picked up without calling forget_secrets().
+# None (the default) means cached secrets never expire.
+OX_SECRETS_TTL_SECONDS = os.environ.get('OX_SECRETS_TTL_SECONDS', None)
+if OX_SECRETS_TTL_SECONDS is not None:
+    OX_SECRETS_TTL_SECONDS = float(OX_SECRETS_TTL_SECONDS)
+
+# If true (set below at run-time or via the environment variable
+# OX_SECRETS_PICKLE_CACHE), the file secret server keeps a pickled
+# snapshot next to the CSV secrets file (filename + '.pkl') so
+# frequently restarted processes can warm-start without re-parsing.
+# Off by default: the snapshot duplicates secret material on disk
+# (with the same care needed for its permissions) and unpickling a
+# tampered snapshot is unsafe, so only enable it where the directory
+# holding the secrets file is trusted.
+OX_SECRETS_PICKLE_CACHE = os.environ.get(
+    'OX_SECRETS_PICKLE_CACHE', '').lower() in ('1', 'true', 'yes')